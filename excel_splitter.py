@@ -1,23 +1,142 @@
+import argparse
+import bisect
+import datetime
+import hashlib
+import io
 import os
+import pickle
+import re
+import shutil
+import subprocess
 import sys
+import tempfile
+import zipfile
 import tkinter as tk
 from tkinter import filedialog, simpledialog, messagebox, ttk
 from copy import copy
 import openpyxl
-from openpyxl.utils import get_column_letter
+from openpyxl.cell.cell import Cell
+from openpyxl.styles import NamedStyle
+from openpyxl.styles.named_styles import NamedStyleList
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.worksheet.dimensions import RowDimension
+from openpyxl.worksheet.merge import MergedCellRange
 import threading
+import time
 import queue
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, CancelledError, as_completed
+
+# Optional accelerators for the fast path: when both are available the sheet
+# XML is streamed directly with lxml and rewritten with xlsxwriter, bypassing
+# the openpyxl object model entirely.
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+# Optional SIMD-accelerated deflate: saving a chunk is mostly zipping XML, and
+# stdlib zlib dominates that CPU cost. isal and zlib-ng are drop-in zlib
+# replacements; pointing zipfile's zlib reference at one transparently speeds
+# up every workbook save (and zip read) in the process.
+try:
+    from isal import isal_zlib as _accelerated_zlib
+except ImportError:
+    try:
+        from zlib_ng import zlib_ng as _accelerated_zlib
+    except ImportError:
+        _accelerated_zlib = None
+if _accelerated_zlib is not None:
+    zipfile.zlib = _accelerated_zlib
+
+# How many rows to copy between cancellation checks inside a chunk build.
+_CANCEL_CHECK_ROWS = 1024
+
+def _probe_direct_cell_construction():
+    """True when Cell objects can be built without going through Cell.__init__.
+
+    The direct-construction write path touches openpyxl internals (slots and
+    the worksheet's _cells dict); probing once at import keeps the hot loop
+    free of per-cell guards and reverts cleanly on an openpyxl change.
+    """
+    try:
+        cell = Cell.__new__(Cell)
+        cell.parent = None
+        cell.row = 1
+        cell.column = 1
+        cell._value = None
+        cell.data_type = 'n'
+        cell._style = None
+        cell._hyperlink = None
+        cell._comment = None
+    except AttributeError:
+        return False
+    return True
+
+_DIRECT_CELLS_OK = _probe_direct_cell_construction()
+
+class _SplitCancelled(Exception):
+    """Raised inside a chunk build when the user has requested cancellation."""
 
 # --- Global Style Cache and Function Placeholders ---
 style_cache = {}
 _copy_cell_properties = None
-_copy_row_formatting = None
+# True when the current chunk workbook shares the source's style registries,
+# letting the optimized copy path reassign StyleArray indices directly.
+_styles_adopted = False
 
 # --- UI and Core Logic Classes ---
 
+# All 31 possible states of the 30-character bar, built once instead of
+# concatenated on every repaint.
+_BAR_LENGTH = 30
+_BAR_TABLE = ['█' * i + '-' * (_BAR_LENGTH - i) for i in range(_BAR_LENGTH + 1)]
+
+def _terminal_progress_text(current_step, total_steps):
+    """Renders the carriage-return terminal progress bar line."""
+    progress_percent = (current_step / total_steps) * 100
+    bar = _BAR_TABLE[_BAR_LENGTH * current_step // total_steps]
+    return f"\rProgress: |{bar}| {progress_percent:.1f}% ({current_step}/{total_steps}) - Processing..."
+
+class CliProgress:
+    """Terminal-only progress reporting for headless runs.
+
+    The chunk count is not known until the worker has sized the source, so
+    the reporter starts without a total and receives it via set_total().
+    """
+    def __init__(self, total_steps=0):
+        self.total_steps = total_steps
+        self._last_draw = 0.0
+
+    def set_total(self, total_steps):
+        self.total_steps = total_steps
+
+    def update(self, current_step, status_text):
+        if self.total_steps <= 0:
+            return
+        now = time.monotonic()
+        if current_step < self.total_steps and now - self._last_draw < 0.033:
+            return
+        self._last_draw = now
+        sys.stdout.write(_terminal_progress_text(current_step, self.total_steps))
+        sys.stdout.flush()
+
+    def close(self):
+        sys.stdout.write('\n')
+
 class ProgressManager:
-    """Manages the Toplevel progress window UI."""
-    def __init__(self, parent, title, total_steps, cancel_event):
+    """Manages the Toplevel progress window UI.
+
+    The chunk count is not known until the worker has sized the source, so
+    the window opens without a total and receives it via set_total() when the
+    worker's init message arrives.
+    """
+    def __init__(self, parent, title, cancel_event, total_steps=0):
         self.parent = parent
         self.total_steps = total_steps
         self.cancel_event = cancel_event
@@ -27,24 +146,30 @@ class ProgressManager:
         self.window.protocol("WM_DELETE_WINDOW", self.request_cancel)
         self.status_label = tk.Label(self.window, text="Initializing...", padx=20, pady=10, width=60)
         self.status_label.pack()
-        self.progress_bar = ttk.Progressbar(self.window, orient="horizontal", length=400, mode="determinate", maximum=total_steps)
+        self.progress_bar = ttk.Progressbar(self.window, orient="horizontal", length=400, mode="determinate", maximum=max(total_steps, 1))
         self.progress_bar.pack(padx=20, pady=5)
         self.cancel_button = tk.Button(self.window, text="Cancel", command=self.request_cancel, width=10)
         self.cancel_button.pack(pady=10)
+        self._last_draw = 0.0
         self.parent.update_idletasks()
-        
+
+    def set_total(self, total_steps):
+        self.total_steps = total_steps
+        self.progress_bar['maximum'] = max(total_steps, 1)
+
     def update(self, current_step, status_text):
-        """Updates the GUI and terminal progress indicators."""
+        """Updates the GUI and terminal progress indicators, throttled to ~30 Hz."""
+        if self.total_steps <= 0:
+            self.status_label.config(text=status_text)
+            return
+        now = time.monotonic()
+        if current_step < self.total_steps and now - self._last_draw < 0.033:
+            return
+        self._last_draw = now
         self.progress_bar['value'] = current_step
         self.status_label.config(text=status_text)
-        progress_percent = (current_step / self.total_steps) * 100
-        bar_length = 30
-        filled_length = int(bar_length * current_step // self.total_steps)
-        bar = '█' * filled_length + '-' * (bar_length - filled_length)
-        terminal_text = f"\rProgress: |{bar}| {progress_percent:.1f}% ({current_step}/{self.total_steps}) - Processing..."
-        sys.stdout.write(terminal_text)
+        sys.stdout.write(_terminal_progress_text(current_step, self.total_steps))
         sys.stdout.flush()
-        self.parent.update_idletasks()
 
     def request_cancel(self):
         """Flags the operation for cancellation after user confirmation."""
@@ -62,6 +187,9 @@ def _copy_cell_properties_v1(source_cell, target_cell):
     """Standard (slow) method: Copies cell value and all style attributes individually."""
     target_cell.value = source_cell.value
     if source_cell.has_style:
+        # Style objects are immutable, but the cell accessors return StyleProxy
+        # wrappers that the style setters reject, so copy() (which unwraps the
+        # proxy) cannot be replaced by plain reference sharing here.
         target_cell.font = copy(source_cell.font)
         target_cell.border = copy(source_cell.border)
         target_cell.fill = copy(source_cell.fill)
@@ -73,129 +201,903 @@ def _copy_cell_properties_v1(source_cell, target_cell):
     if source_cell.comment:
         target_cell.comment = copy(source_cell.comment)
 
-def _copy_row_formatting_v1(ws_source, ws_target, source_row_idx, target_row_idx, max_col):
-    """Standard (slow) method: Copies an entire row by iterating through each cell."""
-    for col_idx in range(1, max_col + 1):
-        source_cell = ws_source.cell(row=source_row_idx, column=col_idx)
-        target_cell = ws_target.cell(row=target_row_idx, column=col_idx)
-        _copy_cell_properties(source_cell, target_cell)
-    if source_row_idx in ws_source.row_dimensions:
-        ws_target.row_dimensions[target_row_idx].height = ws_source.row_dimensions[source_row_idx].height
-
 # --- Copying Functions Version 2 (Optimized) ---
 def _copy_cell_properties_v2(source_cell, target_cell):
-    """Optimized (fast) method: Copies cell value and reuses style objects via a cache."""
+    """Optimized (fast) method: Copies cell value and applies a pooled NamedStyle."""
     target_cell.value = source_cell.value
-    if source_cell.has_style:
-        style_key = source_cell._style
-        if style_key in style_cache:
-            target_cell._style = style_cache[style_key]
-        else:
-            target_cell.font = copy(source_cell.font)
-            target_cell.border = copy(source_cell.border)
-            target_cell.fill = copy(source_cell.fill)
-            target_cell.number_format = source_cell.number_format
-            target_cell.protection = copy(source_cell.protection)
-            target_cell.alignment = copy(source_cell.alignment)
-            style_cache[style_key] = target_cell._style
-    if source_cell.hyperlink:
+    if source_cell.hyperlink is not None:
         target_cell.hyperlink = copy(source_cell.hyperlink)
-    if source_cell.comment:
+    if source_cell.comment is not None:
         target_cell.comment = copy(source_cell.comment)
-
-def _copy_row_formatting_v2(ws_source, ws_target, source_row_idx, target_row_idx, max_col):
-    """Optimized (fast) method: Copies an entire row by iterating through each cell."""
-    for col_idx in range(1, max_col + 1):
-        source_cell = ws_source.cell(row=source_row_idx, column=col_idx)
-        target_cell = ws_target.cell(row=target_row_idx, column=col_idx)
-        _copy_cell_properties(source_cell, target_cell)
-    if source_row_idx in ws_source.row_dimensions:
-        ws_target.row_dimensions[target_row_idx].height = ws_source.row_dimensions[source_row_idx].height
+    style_key = source_cell._style
+    # Default-styled cells — the vast majority in data-heavy sheets — carry
+    # nothing worth copying; bail out before any cache traffic.
+    if style_key is None or not any(style_key):
+        return
+    if _styles_adopted:
+        # The chunk workbook shares the source's style registries, so the
+        # StyleArray index tuple can be handed over as-is.
+        target_cell._style = style_key
+        return
+    named_style = style_cache.get(style_key)
+    if named_style is None:
+        # copy() unwraps the StyleProxy accessors into the plain immutable
+        # style objects; this runs once per distinct style, after which the
+        # pooled instances are shared by reference across every cell.
+        named_style = NamedStyle(
+            name=f"splitxl_s{len(style_cache)}",
+            font=copy(source_cell.font),
+            border=copy(source_cell.border),
+            fill=copy(source_cell.fill),
+            number_format=source_cell.number_format,
+            protection=copy(source_cell.protection),
+            alignment=copy(source_cell.alignment),
+        )
+        style_cache[style_key] = named_style
+    target_cell.style = named_style
 
 # --- Other Helper Functions ---
-def _copy_merged_cells(ws_source, ws_target, min_row, max_row, row_offset):
-    """Copies and adjusts merged cell ranges from a source to a target worksheet."""
-    for merged_range in ws_source.merged_cells.ranges:
-        if merged_range.min_row >= min_row and merged_range.max_row <= max_row:
-            new_min_row = merged_range.min_row - row_offset
-            new_max_row = merged_range.max_row - row_offset
+def _put_progress(progress_queue, step, status):
+    """Queues a progress update, dropping unread stale ones so the UI reads the latest.
+
+    Only stale 'progress' messages are discarded; anything else (e.g. warnings)
+    is requeued for the UI to handle.
+    """
+    kept = []
+    try:
+        while True:
+            message = progress_queue.get_nowait()
+            if message['type'] != 'progress':
+                kept.append(message)
+    except queue.Empty:
+        pass
+    for message in kept:
+        progress_queue.put(message)
+    progress_queue.put({'type': 'progress', 'step': step, 'status': status})
+
+def _build_merge_index(ws_source, min_row=1):
+    """Builds a merge index sorted by min_row for binary-searched chunk lookups."""
+    merges = sorted((r.min_row, r.max_row, r.min_col, r.max_col)
+                    for r in ws_source.merged_cells.ranges if r.min_row >= min_row)
+    return merges, [m[0] for m in merges]
+
+def _copy_merged_cells(merges, merge_min_rows, ws_target, min_row, max_row, row_offset):
+    """Copies merged ranges fully contained in [min_row, max_row] from a sorted merge index.
+
+    Adds ranges directly to ws_target.merged_cells instead of going through
+    merge_cells(), which would re-walk every covered cell to blank it; the
+    chunk builder never writes values inside a merged area, so that pass is
+    pure overhead proportional to the merged area.
+    """
+    for idx in range(bisect.bisect_left(merge_min_rows, min_row), len(merges)):
+        merge_min_row, merge_max_row, merge_min_col, merge_max_col = merges[idx]
+        if merge_min_row > max_row:
+            break
+        if merge_max_row <= max_row:
             try:
-                ws_target.merge_cells(start_row=new_min_row, start_column=merged_range.min_col,
-                                      end_row=new_max_row, end_column=merged_range.max_col)
+                ws_target.merged_cells.add(MergedCellRange(
+                    ws_target,
+                    f"{get_column_letter(merge_min_col)}{merge_min_row - row_offset}:"
+                    f"{get_column_letter(merge_max_col)}{merge_max_row - row_offset}"))
             except Exception as e:
-                print(f"Warning: Could not merge range {merged_range}: {e}")
+                print(f"Warning: Could not merge range rows {merge_min_row}-{merge_max_row}: {e}")
+
+def _cached_values_missing(input_file, heading_rows):
+    """True when formula cells would lose their values in a data_only load.
 
-# --- Worker Function ---
-def split_excel_file_with_formatting(input_file, output_directory, chunk_size, heading_rows, preserve_formulas, progress_queue, cancel_event):
-    """Performs the Excel splitting in a worker thread."""
+    Excel stores each formula's last calculated value next to the formula, but
+    files written by other tools (or never opened in Excel) lack them, so
+    data_only=True silently loads None everywhere. Samples the first few data
+    rows to detect that before the split runs; rows that are empty under
+    data_only but hold no formulas either are simply blank, and must not
+    trigger a warning or a LibreOffice round-trip.
+    """
+    try:
+        sample_rows = (heading_rows + 1, heading_rows + 5)
+        wb_sample = openpyxl.load_workbook(input_file, data_only=True, read_only=True)
+        try:
+            sampled_cells = 0
+            empty_cells = 0
+            for row in wb_sample.active.iter_rows(min_row=sample_rows[0], max_row=sample_rows[1], values_only=True):
+                sampled_cells += len(row)
+                empty_cells += sum(1 for value in row if value is None)
+        finally:
+            wb_sample.close()
+        if not sampled_cells or empty_cells != sampled_cells:
+            return False
+        wb_formulas = openpyxl.load_workbook(input_file, data_only=False, read_only=True)
+        try:
+            for row in wb_formulas.active.iter_rows(min_row=sample_rows[0], max_row=sample_rows[1], values_only=True):
+                if any(isinstance(value, str) and value.startswith('=') for value in row):
+                    return True
+        finally:
+            wb_formulas.close()
+    except Exception:
+        return False
+    return False
+
+def _materialize_cached_values(input_file):
+    """Recalculates the file with LibreOffice so formula results exist.
+
+    Runs soffice --headless --convert-to xlsx once and caches the converted
+    copy under ~/.cache/splitxl keyed by the source path and mtime, so
+    repeated splits of the same file skip the conversion. Returns the path of
+    the converted copy, or None when LibreOffice is unavailable or fails. The
+    cached copy keeps the original file name so output files are named after
+    the real source.
+    """
+    soffice = shutil.which('soffice')
+    if soffice is None:
+        return None
+    try:
+        cache_key = hashlib.sha1(
+            f"{os.path.abspath(input_file)}:{os.path.getmtime(input_file)}".encode()).hexdigest()
+        cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'splitxl', cache_key)
+        cached_copy = os.path.join(cache_dir, os.path.basename(input_file))
+        if os.path.exists(cached_copy):
+            return cached_copy
+        with tempfile.TemporaryDirectory() as convert_dir:
+            subprocess.run(
+                [soffice, '--headless', '--calc', '--convert-to', 'xlsx', input_file, '--outdir', convert_dir],
+                check=True, timeout=600, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            converted = os.path.join(
+                convert_dir, os.path.splitext(os.path.basename(input_file))[0] + '.xlsx')
+            if not os.path.exists(converted):
+                return None
+            os.makedirs(cache_dir, exist_ok=True)
+            shutil.move(converted, cached_copy)
+        return cached_copy
+    except Exception:
+        return None
+
+def _ensure_cached_values(input_file, heading_rows, progress_queue):
+    """Returns a source path whose formula cells carry calculated values.
+
+    When the sampled data rows show no cached values, tries a LibreOffice
+    recalculation first and only warns the user if that is not possible.
+    """
+    if not _cached_values_missing(input_file, heading_rows):
+        return input_file
+    converted = _materialize_cached_values(input_file)
+    if converted is not None:
+        print(f"Note: recalculated formulas via LibreOffice; splitting cached copy {converted}")
+        return converted
+    progress_queue.put({'type': 'warn', 'message': (
+        "The sampled data rows contain no cached values. If the file has "
+        "never been opened (and saved) in Excel, converting formulas to "
+        "values will produce empty cells. Installing LibreOffice lets "
+        "SplitXL recalculate the file automatically.")})
+    return input_file
+
+def _detect_dimensions(ws):
+    """Returns (max_row, max_column), rescanning the sheet when its metadata is unreliable.
+
+    Returns (0, 0) for a sheet with no cells at all, so callers can report
+    the empty-sheet case instead of tripping over None dimensions.
+    """
+    try:
+        dimension = ws.calculate_dimension()
+    except ValueError:
+        dimension = "A1:A1"
+    if dimension == "A1:A1" and hasattr(ws, 'reset_dimensions'):
+        # A read-only sheet reports None for both maxima after a reset;
+        # force a row walk to recount them before anyone does arithmetic.
+        ws.reset_dimensions()
+        try:
+            ws.calculate_dimension(force=True)
+        except Exception:
+            pass
+    if ws.max_row is None or ws.max_column is None:
+        return 0, 0
+    return ws.max_row, ws.max_column
+
+
+
+class _BackgroundSaver:
+    """Saves finished chunk workbooks on a daemon thread.
+
+    Building chunk k+1 is mostly CPU while saving chunk k is mostly zip and
+    disk I/O, so overlapping the two hides the save tail. The queue is bounded
+    so at most two finished workbooks are ever held in memory.
+    """
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=2)
+        self._error = None
+        self.files_created = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            workbook, path = item
+            if self._error is None:
+                try:
+                    workbook.save(path)
+                    self.files_created += 1
+                except Exception as e:
+                    self._error = (path, e)
+
+    @property
+    def error(self):
+        return self._error
+
+    def submit(self, workbook, path):
+        """Queues a finished workbook for saving; blocks while two are pending."""
+        self._queue.put((workbook, path))
+
+    def finish(self):
+        """Waits for all pending saves and returns the first (path, error), if any."""
+        self._queue.put(None)
+        self._thread.join()
+        return self._error
+
+# --- Raw-XML Fast Path Helpers ---
+_XLSX_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_XLSX_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_XLSX_PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+# Built-in number formats that render as dates/times, plus a heuristic for
+# custom format codes (date tokens outside quoted literals/color brackets).
+_DATE_BUILTIN_FORMATS = set(range(14, 23)) | set(range(45, 48))
+_DATE_TOKEN_RE = re.compile(r'[dmhysDMHYS]')
+
+def _locate_active_sheet(zf):
+    """Returns (archive path, title) of the workbook's active sheet.
+
+    Every other path splits wb.active, so the raw-XML path must resolve the
+    same tab: bookViews/workbookView@activeTab, defaulting to the first
+    sheet when the view metadata is absent — matching openpyxl's reader.
+    """
+    workbook_root = lxml_etree.fromstring(zf.read('xl/workbook.xml'))
+    sheets = workbook_root.findall(f'{{{_XLSX_MAIN_NS}}}sheets/{{{_XLSX_MAIN_NS}}}sheet')
+    view = workbook_root.find(f'{{{_XLSX_MAIN_NS}}}bookViews/{{{_XLSX_MAIN_NS}}}workbookView')
+    try:
+        active_index = int(view.get('activeTab', '0')) if view is not None else 0
+    except ValueError:
+        active_index = 0
+    if not 0 <= active_index < len(sheets):
+        active_index = 0
+    sheet = sheets[active_index]
+    rel_id = sheet.get(f'{{{_XLSX_REL_NS}}}id')
+    rels_root = lxml_etree.fromstring(zf.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels_root.iter(f'{{{_XLSX_PKG_REL_NS}}}Relationship'):
+        if rel.get('Id') == rel_id:
+            target = rel.get('Target').lstrip('/')
+            if not target.startswith('xl/'):
+                target = 'xl/' + target
+            return target, sheet.get('name')
+    raise KeyError(f"No relationship found for sheet {rel_id}")
+
+def _sheet_uses_date_formats(zf):
+    """True when any cell format in styles.xml renders as a date or time.
+
+    Date cells are stored as plain serial numbers in the sheet XML; only
+    openpyxl's style-aware reader converts them back to datetimes, so the
+    raw-XML path must not be used on such files.
+    """
+    try:
+        styles_root = lxml_etree.fromstring(zf.read('xl/styles.xml'))
+    except KeyError:
+        return False
+    date_format_ids = set(_DATE_BUILTIN_FORMATS)
+    for num_fmt in styles_root.iter(f'{{{_XLSX_MAIN_NS}}}numFmt'):
+        code = re.sub(r'"[^"]*"|\[[^\]]*\]', '', num_fmt.get('formatCode', ''))
+        if _DATE_TOKEN_RE.search(code):
+            date_format_ids.add(int(num_fmt.get('numFmtId')))
+    cell_xfs = styles_root.find(f'{{{_XLSX_MAIN_NS}}}cellXfs')
+    if cell_xfs is None:
+        return False
+    return any(int(xf.get('numFmtId', '0')) in date_format_ids
+               for xf in cell_xfs.iter(f'{{{_XLSX_MAIN_NS}}}xf'))
+
+def _load_shared_strings(zf):
+    """Reads xl/sharedStrings.xml into a list; returns [] when absent."""
+    try:
+        data = zf.read('xl/sharedStrings.xml')
+    except KeyError:
+        return []
+    strings = []
+    text_tag = f'{{{_XLSX_MAIN_NS}}}t'
+    for _, si in lxml_etree.iterparse(io.BytesIO(data), tag=f'{{{_XLSX_MAIN_NS}}}si'):
+        strings.append(''.join(t.text or '' for t in si.iter(text_tag)))
+        si.clear()
+    return strings
+
+def _xml_cell_value(cell_elem, shared_strings):
+    """Decodes one <c> element to a Python value (str, bool, int, float or None)."""
+    cell_type = cell_elem.get('t', 'n')
+    if cell_type == 'inlineStr':
+        return ''.join(t.text or '' for t in cell_elem.iter(f'{{{_XLSX_MAIN_NS}}}t'))
+    value = cell_elem.findtext(f'{{{_XLSX_MAIN_NS}}}v')
+    if not value:
+        # Formula cells with no cached result are stored as an empty <v/>
+        # (openpyxl writes exactly that); they load as None, matching the
+        # openpyxl fallback's data_only behavior.
+        return None
+    if cell_type == 's':
+        return shared_strings[int(value)]
+    if cell_type in ('str', 'e'):
+        return value
+    if cell_type == 'b':
+        return value == '1'
+    if cell_type == 'd':
+        return datetime.datetime.fromisoformat(value)
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+def _xml_fast_path_applicable(input_file):
+    """True when the raw-XML fast path can faithfully handle this file."""
+    if lxml_etree is None or xlsxwriter is None:
+        return False
+    try:
+        with zipfile.ZipFile(input_file) as zf:
+            _locate_active_sheet(zf)
+            return not _sheet_uses_date_formats(zf)
+    except Exception:
+        return False
+
+def _split_fast_xml(input_file, output_directory, chunk_size, heading_rows, progress_queue, cancel_event, total_rows, max_col):
+    """Fastest path: streams the sheet XML with lxml, writes chunks with xlsxwriter.
+
+    Bypasses openpyxl on both sides: rows are decoded straight from the
+    worksheet XML (shared strings resolved once) and written through
+    xlsxwriter's constant_memory mode, so memory stays flat and no cell
+    objects are ever built. Values only; formulas are replaced by their
+    cached results.
+    """
     input_filename_base = os.path.splitext(os.path.basename(input_file))[0]
     files_created = 0
-    
+    num_chunks = (total_rows - heading_rows + chunk_size - 1) // chunk_size
+    progress_queue.put({'type': 'init', 'num_chunks': num_chunks})
+    row_tag = f'{{{_XLSX_MAIN_NS}}}row'
+    # Letter->index for every column we care about, computed once per file so
+    # the per-cell loop is a single dict lookup instead of a function call.
+    col_index_of = {get_column_letter(i): i for i in range(1, max_col + 1)}
+
     try:
-        wb_source = openpyxl.load_workbook(input_file, data_only=not preserve_formulas)
+        with zipfile.ZipFile(input_file) as zf:
+            sheet_path, sheet_title = _locate_active_sheet(zf)
+            shared_strings = _load_shared_strings(zf)
+
+            header_rows = []
+            state = {'wb': None, 'ws': None, 'chunk': -1, 'start': 0, 'date_format': None}
+
+            def write_row(ws, target_row, cells):
+                for col_idx, value in cells:
+                    if value is None:
+                        continue
+                    if isinstance(value, str):
+                        # write_string, not write: a plain write() would parse
+                        # leading '=' as a formula.
+                        ws.write_string(target_row, col_idx - 1, value)
+                    elif isinstance(value, bool):
+                        ws.write_boolean(target_row, col_idx - 1, value)
+                    elif isinstance(value, datetime.datetime):
+                        ws.write_datetime(target_row, col_idx - 1, value, state['date_format'])
+                    else:
+                        ws.write_number(target_row, col_idx - 1, value)
+
+            def rotate_to(chunk_idx):
+                nonlocal files_created
+                while state['chunk'] < chunk_idx:
+                    if state['wb'] is not None:
+                        state['wb'].close()
+                        files_created += 1
+                    state['chunk'] += 1
+                    start_row = heading_rows + state['chunk'] * chunk_size + 1
+                    end_row = min(heading_rows + (state['chunk'] + 1) * chunk_size, total_rows)
+                    output_path = os.path.join(output_directory, f"{input_filename_base}_rows_{start_row}-{end_row}.xlsx")
+                    state['wb'] = xlsxwriter.Workbook(output_path, {'constant_memory': True})
+                    # For explicit t="d" cells; matches openpyxl's default
+                    # datetime display format.
+                    state['date_format'] = state['wb'].add_format({'num_format': 'yyyy-mm-dd h:mm:ss'})
+                    state['ws'] = state['wb'].add_worksheet(sheet_title)
+                    state['start'] = start_row
+                    for header_idx, header_cells in enumerate(header_rows):
+                        write_row(state['ws'], header_idx, header_cells)
+                    _put_progress(progress_queue, state['chunk'] + 1, f"Processing chunk {state['chunk'] + 1}/{num_chunks}...")
+
+            last_source_row = 0
+            with zf.open(sheet_path) as sheet_stream:
+                for _, row_elem in lxml_etree.iterparse(sheet_stream, tag=row_tag):
+                    row_ref = row_elem.get('r')
+                    source_row = int(row_ref) if row_ref else last_source_row + 1
+                    last_source_row = source_row
+                    cells = []
+                    last_col = 0
+                    for cell_elem in row_elem:
+                        cell_ref = cell_elem.get('r')
+                        if cell_ref:
+                            letters = cell_ref.rstrip('0123456789')
+                            # A miss means the column is beyond max_col.
+                            col_idx = col_index_of.get(letters) or column_index_from_string(letters)
+                        else:
+                            col_idx = last_col + 1
+                        last_col = col_idx
+                        if col_idx <= max_col:
+                            cells.append((col_idx, _xml_cell_value(cell_elem, shared_strings)))
+                    row_elem.clear()
+                    while row_elem.getprevious() is not None:
+                        del row_elem.getparent()[0]
+
+                    if source_row <= heading_rows:
+                        header_rows.append(cells)
+                        continue
+                    if source_row > total_rows:
+                        break
+                    if source_row % _CANCEL_CHECK_ROWS == 0 and cancel_event.is_set():
+                        if state['wb'] is not None:
+                            state['wb'].close()
+                            files_created += 1
+                        progress_queue.put({'type': 'result', 'data': {'status': 'cancelled', 'message': 'Operation cancelled.', 'files_created': files_created}})
+                        return
+                    chunk_idx = (source_row - heading_rows - 1) // chunk_size
+                    if chunk_idx != state['chunk']:
+                        if cancel_event.is_set():
+                            if state['wb'] is not None:
+                                state['wb'].close()
+                                files_created += 1
+                            progress_queue.put({'type': 'result', 'data': {'status': 'cancelled', 'message': 'Operation cancelled.', 'files_created': files_created}})
+                            return
+                        rotate_to(chunk_idx)
+                    write_row(state['ws'], heading_rows + source_row - state['start'], cells)
+
+            # Emit any trailing chunks the row stream never reached, matching
+            # the openpyxl path which iterates all the way to total_rows.
+            rotate_to(num_chunks - 1)
+            if state['wb'] is not None:
+                state['wb'].close()
+                files_created += 1
+    except Exception as e:
+        progress_queue.put({'type': 'result', 'data': {'status': 'error', 'message': f"Error splitting file: {e}", 'files_created': files_created}})
+        return
+
+    progress_queue.put({'type': 'result', 'data': {'status': 'success', 'message': f'Successfully created {files_created} files.', 'files_created': files_created}})
+
+# --- Worker Functions ---
+def split_excel_file_with_formatting(input_file, output_directory, chunk_size, heading_rows, preserve_formulas, preserve_formatting, progress_queue, cancel_event, total_rows=None, max_col=None):
+    """Entry point for the worker thread; dispatches to the fast or fidelity path.
+
+    total_rows/max_col may be supplied from the GUI's read_only pre-scan so the
+    worker does not have to re-derive the sheet dimensions.
+    """
+    if not preserve_formulas:
+        input_file = _ensure_cached_values(input_file, heading_rows, progress_queue)
+    if preserve_formatting:
+        _split_with_formatting(input_file, output_directory, chunk_size, heading_rows, preserve_formulas, progress_queue, cancel_event, total_rows, max_col)
+    else:
+        _split_fast(input_file, output_directory, chunk_size, heading_rows, preserve_formulas, progress_queue, cancel_event, total_rows, max_col)
+
+def _split_fast(input_file, output_directory, chunk_size, heading_rows, preserve_formulas, progress_queue, cancel_event, total_rows=None, max_col=None):
+    """Fast path: streams the source in read_only mode and writes value-only chunks.
+
+    read_only mode parses the sheet XML incrementally, so memory stays near-constant
+    regardless of input size. Formatting, merges and comments are not preserved.
+    """
+    if not preserve_formulas and _xml_fast_path_applicable(input_file):
+        if total_rows is None or max_col is None:
+            # The XML path needs the dimensions up front; probe them from the
+            # sheet's dimension element (cheap unless the file lacks one).
+            try:
+                wb_probe = openpyxl.load_workbook(input_file, read_only=True)
+                try:
+                    total_rows, max_col = _detect_dimensions(wb_probe.active)
+                finally:
+                    wb_probe.close()
+            except Exception:
+                total_rows = max_col = None
+        if total_rows is not None and max_col is not None and total_rows > heading_rows:
+            _split_fast_xml(input_file, output_directory, chunk_size, heading_rows, progress_queue, cancel_event, total_rows, max_col)
+            return
+
+    input_filename_base = os.path.splitext(os.path.basename(input_file))[0]
+    files_created = 0
+
+    try:
+        wb_source = openpyxl.load_workbook(input_file, data_only=not preserve_formulas, read_only=True)
         ws_source = wb_source.active
     except Exception as e:
         progress_queue.put({'type': 'result', 'data': {'status': 'error', 'message': f"Error loading Excel file: {e}", 'files_created': 0}})
         return
 
-    total_rows, max_col = ws_source.max_row, ws_source.max_column
+    try:
+        if total_rows is None or max_col is None:
+            total_rows, max_col = _detect_dimensions(ws_source)
+        if total_rows == 0:
+            progress_queue.put({'type': 'result', 'data': {'status': 'success', 'message': "Input file's active sheet was empty.", 'files_created': 0}})
+            return
+
+        data_rows_to_process = total_rows - heading_rows
+        if data_rows_to_process <= 0:
+            progress_queue.put({'type': 'result', 'data': {'status': 'error', 'message': 'No data rows to process after accounting for header rows.', 'files_created': 0}})
+            return
+
+        num_chunks = (data_rows_to_process + chunk_size - 1) // chunk_size
+        progress_queue.put({'type': 'init', 'num_chunks': num_chunks})
+        rows_iter = ws_source.iter_rows(max_col=max_col, values_only=True)
+        header_rows = [row for _, row in zip(range(heading_rows), rows_iter)]
+        saver = _BackgroundSaver()
+
+        for i in range(num_chunks):
+            if cancel_event.is_set():
+                saver.finish()
+                progress_queue.put({'type': 'result', 'data': {'status': 'cancelled', 'message': 'Operation cancelled.', 'files_created': saver.files_created}})
+                return
+
+            source_data_start_row = heading_rows + (i * chunk_size) + 1
+            source_data_end_row = min(heading_rows + ((i + 1) * chunk_size), total_rows)
+
+            status_text = f"Processing chunk {i+1}/{num_chunks}..."
+            _put_progress(progress_queue, i + 1, status_text)
+
+            wb_chunk = openpyxl.Workbook(write_only=True)
+            ws_chunk = wb_chunk.create_sheet(title=ws_source.title)
+            for header_row in header_rows:
+                ws_chunk.append(header_row)
+            for rows_appended, row in enumerate(
+                    (r for _, r in zip(range(source_data_end_row - source_data_start_row + 1), rows_iter)), 1):
+                ws_chunk.append(row)
+                if rows_appended % _CANCEL_CHECK_ROWS == 0 and cancel_event.is_set():
+                    saver.finish()
+                    progress_queue.put({'type': 'result', 'data': {'status': 'cancelled', 'message': 'Operation cancelled.', 'files_created': saver.files_created}})
+                    return
+
+            output_file_name = f"{input_filename_base}_rows_{source_data_start_row}-{source_data_end_row}.xlsx"
+            output_path = os.path.join(output_directory, output_file_name)
+            saver.submit(wb_chunk, output_path)
+            if saver.error:
+                break
+
+        save_error = saver.finish()
+        files_created = saver.files_created
+        if save_error:
+            progress_queue.put({'type': 'result', 'data': {'status': 'error', 'message': f"Error saving {save_error[0]}: {save_error[1]}", 'files_created': files_created}})
+            return
+        progress_queue.put({'type': 'result', 'data': {'status': 'success', 'message': f'Successfully created {files_created} files.', 'files_created': files_created}})
+    finally:
+        wb_source.close()
+
+def _split_with_formatting(input_file, output_directory, chunk_size, heading_rows, preserve_formulas, progress_queue, cancel_event, total_rows=None, max_col=None):
+    """Fidelity path: splits the file while preserving formatting.
+
+    Chunks are independent of each other, so they are fanned out to a small
+    process pool; openpyxl's pure-Python copy loops are GIL-bound and gain
+    nothing from threads. Each worker process loads the source once and is
+    reused for all chunks assigned to it.
+    """
+    input_filename_base = os.path.splitext(os.path.basename(input_file))[0]
+    files_created = 0
+
+    if total_rows is None or max_col is None:
+        try:
+            wb_probe = openpyxl.load_workbook(input_file, read_only=True)
+            try:
+                total_rows, max_col = _detect_dimensions(wb_probe.active)
+            finally:
+                wb_probe.close()
+        except Exception as e:
+            progress_queue.put({'type': 'result', 'data': {'status': 'error', 'message': f"Error loading Excel file: {e}", 'files_created': 0}})
+            return
+
     if total_rows == 0:
         progress_queue.put({'type': 'result', 'data': {'status': 'success', 'message': "Input file's active sheet was empty.", 'files_created': 0}})
         return
-    
+
     data_rows_to_process = total_rows - heading_rows
     if data_rows_to_process <= 0:
         progress_queue.put({'type': 'result', 'data': {'status': 'error', 'message': 'No data rows to process after accounting for header rows.', 'files_created': 0}})
         return
-    
+
     num_chunks = (data_rows_to_process + chunk_size - 1) // chunk_size
+    progress_queue.put({'type': 'init', 'num_chunks': num_chunks})
+    use_optimized = _copy_cell_properties is not _copy_cell_properties_v1
 
+    jobs = []
     for i in range(num_chunks):
-        if cancel_event.is_set():
-            progress_queue.put({'type': 'result', 'data': {'status': 'cancelled', 'message': 'Operation cancelled.', 'files_created': files_created}})
-            return
-
         source_data_start_row = heading_rows + (i * chunk_size) + 1
         source_data_end_row = min(heading_rows + ((i + 1) * chunk_size), total_rows)
-        
-        status_text = f"Processing chunk {i+1}/{num_chunks}..."
-        progress_queue.put({'type': 'progress', 'step': i + 1, 'status': status_text})
-        
-        style_cache.clear()
-        wb_chunk = openpyxl.Workbook()
-        ws_chunk = wb_chunk.active
-        ws_chunk.title = ws_source.title
-
-        for col_idx in range(1, max_col + 1):
-            col_letter = get_column_letter(col_idx)
-            if col_letter in ws_source.column_dimensions:
-                ws_chunk.column_dimensions[col_letter].width = ws_source.column_dimensions[col_letter].width
-
-        current_target_row = 1
-        if heading_rows > 0:
-            for r_idx in range(1, heading_rows + 1):
-                _copy_row_formatting(ws_source, ws_chunk, r_idx, current_target_row, max_col)
-                current_target_row += 1
-            _copy_merged_cells(ws_source, ws_chunk, 1, heading_rows, 0)
-
-        data_row_offset = source_data_start_row - current_target_row
-        for source_r_idx in range(source_data_start_row, source_data_end_row + 1):
-            _copy_row_formatting(ws_source, ws_chunk, source_r_idx, current_target_row, max_col)
-            current_target_row += 1
-        _copy_merged_cells(ws_source, ws_chunk, source_data_start_row, source_data_end_row, data_row_offset)
-
-        # --- FIX: Reverted to the original, correct filename format ---
         output_file_name = f"{input_filename_base}_rows_{source_data_start_row}-{source_data_end_row}.xlsx"
-        output_path = os.path.join(output_directory, output_file_name)
-        try:
-            wb_chunk.save(output_path)
-            files_created += 1
-        except Exception as e:
-            progress_queue.put({'type': 'result', 'data': {'status': 'error', 'message': f"Error saving {output_path}: {e}", 'files_created': files_created}})
+        jobs.append((source_data_start_row, source_data_end_row, os.path.join(output_directory, output_file_name)))
+
+    # Re-parsing styles.xml in every worker is itself costly, so the fidelity
+    # path keeps the pool conservative instead of using every core.
+    max_workers = min(4, os.cpu_count() or 1, num_chunks)
+
+    if max_workers <= 1:
+        saver = _BackgroundSaver()
+        for i, (start_row, end_row, output_path) in enumerate(jobs):
+            if cancel_event.is_set():
+                saver.finish()
+                progress_queue.put({'type': 'result', 'data': {'status': 'cancelled', 'message': 'Operation cancelled.', 'files_created': saver.files_created}})
+                return
+            _put_progress(progress_queue, i + 1, f"Processing chunk {i+1}/{num_chunks}...")
+            try:
+                _build_one_chunk(input_file, output_path, start_row, end_row, heading_rows, max_col, preserve_formulas, use_optimized, saver=saver, cancel_event=cancel_event)
+            except _SplitCancelled:
+                saver.finish()
+                progress_queue.put({'type': 'result', 'data': {'status': 'cancelled', 'message': 'Operation cancelled.', 'files_created': saver.files_created}})
+                return
+            except Exception as e:
+                saver.finish()
+                progress_queue.put({'type': 'result', 'data': {'status': 'error', 'message': f"Error creating {output_path}: {e}", 'files_created': saver.files_created}})
+                return
+            if saver.error:
+                break
+        save_error = saver.finish()
+        files_created = saver.files_created
+        if save_error:
+            progress_queue.put({'type': 'result', 'data': {'status': 'error', 'message': f"Error saving {save_error[0]}: {save_error[1]}", 'files_created': files_created}})
             return
-    
+    else:
+        worker_cancel = multiprocessing.Event()
+        # Read the source once and hand it to the workers through shared
+        # memory; each worker still parses it, but the zip is only read from
+        # disk a single time.
+        source_shm, source_size = _publish_source_bytes(input_file)
+        initargs = (worker_cancel, source_shm.name, source_size) if source_shm else (worker_cancel,)
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_pool_worker,
+                                     initargs=initargs) as executor:
+                futures = {
+                    executor.submit(_build_one_chunk, input_file, output_path, start_row, end_row,
+                                    heading_rows, max_col, preserve_formulas, use_optimized): output_path
+                    for start_row, end_row, output_path in jobs
+                }
+                for future in as_completed(futures):
+                    if cancel_event.is_set():
+                        worker_cancel.set()
+                        executor.shutdown(wait=True, cancel_futures=True)
+                        progress_queue.put({'type': 'result', 'data': {'status': 'cancelled', 'message': 'Operation cancelled.', 'files_created': files_created}})
+                        return
+                    try:
+                        future.result()
+                        files_created += 1
+                    except (CancelledError, _SplitCancelled):
+                        continue
+                    except Exception as e:
+                        worker_cancel.set()
+                        executor.shutdown(wait=True, cancel_futures=True)
+                        progress_queue.put({'type': 'result', 'data': {'status': 'error', 'message': f"Error creating {futures[future]}: {e}", 'files_created': files_created}})
+                        return
+                    _put_progress(progress_queue, files_created, f"Processing chunk {files_created}/{num_chunks}...")
+        finally:
+            if source_shm is not None:
+                source_shm.close()
+                source_shm.unlink()
+
     progress_queue.put({'type': 'result', 'data': {'status': 'success', 'message': f'Successfully created {files_created} files.', 'files_created': files_created}})
 
+def _adopt_source_styles(wb_source, wb_target):
+    """Points wb_target's style registries at wb_source's, sharing StyleArray indices.
+
+    After adoption, a cell's _style index tuple is valid in both workbooks and
+    can be reassigned directly instead of rebuilding styles through the
+    high-level API. Relies on openpyxl internals, so callers must fall back to
+    the NamedStyle pool when this returns False.
+
+    Named styles are rebuilt as detached copies instead of shared: every
+    NamedStyle holds a _wb backref to its workbook, and sharing the source's
+    list would drag the entire source workbook into the pickled chunk
+    skeleton. The copies keep list order, so xfId indices stay valid.
+    """
+    try:
+        for attr in ('_fonts', '_fills', '_borders', '_alignments', '_protections',
+                     '_number_formats', '_cell_styles'):
+            setattr(wb_target, attr, getattr(wb_source, attr))
+        detached_styles = NamedStyleList()
+        for named_style in wb_source._named_styles:
+            detached = copy(named_style)
+            detached._style = copy(named_style._style)
+            detached._wb = None
+            detached_styles.append(detached)
+        wb_target._named_styles = detached_styles
+    except AttributeError:
+        return False
+    return True
+
+# Pool-worker state installed via the executor initializer; multiprocessing
+# primitives can only reach child processes that way. _worker_source_shm names
+# a shared-memory block holding the raw source .xlsx bytes, so workers read
+# the file from memory instead of each hitting the disk.
+_worker_cancel_event = None
+_worker_source_shm = None
+
+def _init_pool_worker(event, shm_name=None, shm_size=0):
+    global _worker_cancel_event, _worker_source_shm
+    _worker_cancel_event = event
+    _worker_source_shm = (shm_name, shm_size) if shm_name else None
+
+def _publish_source_bytes(input_file):
+    """Copies the source file into a SharedMemory block for pool workers.
+
+    Returns (block, byte_length), or (None, 0) when shared memory is
+    unavailable (the workers then read the file from disk as before). The
+    byte length is tracked separately because the block is rounded up to a
+    page size. The coordinator owns the block and must close() and unlink()
+    it once the pool is done.
+    """
+    try:
+        with open(input_file, 'rb') as f:
+            data = f.read()
+        shm = shared_memory.SharedMemory(create=True, size=len(data))
+        shm.buf[:len(data)] = data
+        return shm, len(data)
+    except Exception:
+        return None, 0
+
+def _open_source(input_file):
+    """Returns the source as a stream from shared memory, or the path itself."""
+    if _worker_source_shm is None:
+        return input_file
+    shm_name, shm_size = _worker_source_shm
+    try:
+        shm = shared_memory.SharedMemory(name=shm_name)
+    except Exception:
+        return input_file
+    try:
+        return io.BytesIO(shm.buf[:shm_size])
+    finally:
+        shm.close()
+        # Attaching registers the block with the resource tracker again (fixed
+        # by track=False in 3.13); unregister so it is not unlinked twice.
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+
+# Per-process cache for chunk builds: the source workbook and the derived
+# header/merge caches are loaded once per worker process and reused.
+_chunk_build_state = {}
+
+def _get_chunk_build_state(input_file, data_only, heading_rows, max_col):
+    """Loads the source workbook and its per-file caches once per process."""
+    key = (input_file, data_only, heading_rows, max_col)
+    state = _chunk_build_state.get(key)
+    if state is None:
+        _chunk_build_state.clear()
+        ws_source = openpyxl.load_workbook(_open_source(input_file), data_only=data_only).active
+        state = {
+            'ws_source': ws_source,
+            'header_row_cells': list(ws_source.iter_rows(min_row=1, max_row=heading_rows, max_col=max_col)) if heading_rows > 0 else [],
+            'header_merges': [str(r) for r in ws_source.merged_cells.ranges if r.max_row <= heading_rows],
+            'header_row_heights': {r: ws_source.row_dimensions[r].height for r in range(1, heading_rows + 1) if r in ws_source.row_dimensions},
+            'data_merge_index': _build_merge_index(ws_source, min_row=heading_rows + 1),
+            'row_heights': {r: dim.height for r, dim in ws_source.row_dimensions.items()
+                            if dim.height is not None},
+            'col_widths': [(letter, dim.width) for letter, dim in ws_source.column_dimensions.items()
+                           if dim.width is not None and column_index_from_string(letter) <= max_col],
+            # Pickled target-workbook skeletons, built lazily per copy method.
+            'skeletons': {},
+        }
+        _chunk_build_state[key] = state
+    return state
+
+def _build_chunk_skeleton(state, heading_rows, use_optimized):
+    """Builds the per-file target workbook template and pickles it.
+
+    The skeleton carries everything that is identical across chunks — sheet
+    title, adopted style registries, column widths, stamped header rows with
+    their heights and merges — so each chunk starts from pickle.loads()
+    instead of re-creating a Workbook (default styles, theme, rels) and
+    re-copying the headers. Returns (skeleton_bytes, styles_adopted).
+    """
+    ws_source = state['ws_source']
+    style_cache.clear()
+    wb_skeleton = openpyxl.Workbook()
+    ws_skeleton = wb_skeleton.active
+    ws_skeleton.title = ws_source.title
+
+    global _styles_adopted
+    _styles_adopted = use_optimized and _adopt_source_styles(ws_source.parent, wb_skeleton)
+
+    for col_letter, width in state['col_widths']:
+        ws_skeleton.column_dimensions[col_letter].width = width
+
+    if heading_rows > 0:
+        for r_idx, header_row in enumerate(state['header_row_cells'], 1):
+            for col_idx, source_cell in enumerate(header_row, 1):
+                _copy_cell_properties(source_cell, ws_skeleton.cell(row=r_idx, column=col_idx))
+        for r_idx, height in state['header_row_heights'].items():
+            ws_skeleton.row_dimensions[r_idx].height = height
+        for merge_range in state['header_merges']:
+            try:
+                ws_skeleton.merge_cells(merge_range)
+            except Exception as e:
+                print(f"Warning: Could not merge range {merge_range}: {e}")
+
+    return pickle.dumps(wb_skeleton), _styles_adopted
+
+def _build_one_chunk(input_file, output_path, source_data_start_row, source_data_end_row, heading_rows, max_col, preserve_formulas, use_optimized, saver=None, cancel_event=None):
+    """Builds and saves a single formatted chunk file; runs in a worker process or inline.
+
+    When a _BackgroundSaver is supplied the finished workbook is handed off to
+    it so the next chunk can be built while this one is written to disk.
+    Raises _SplitCancelled when the cancel event (passed in, or installed by
+    the pool initializer) is set; checked every _CANCEL_CHECK_ROWS rows so a
+    mid-chunk cancel does not wait for the whole chunk.
+    """
+    if cancel_event is None:
+        cancel_event = _worker_cancel_event
+    global _copy_cell_properties
+    _copy_cell_properties = _copy_cell_properties_v2 if use_optimized else _copy_cell_properties_v1
+
+    state = _get_chunk_build_state(input_file, not preserve_formulas, heading_rows, max_col)
+    ws_source = state['ws_source']
+    data_merges, data_merge_min_rows = state['data_merge_index']
+
+    skeleton = state['skeletons'].get(use_optimized)
+    if skeleton is None:
+        skeleton = _build_chunk_skeleton(state, heading_rows, use_optimized)
+        state['skeletons'][use_optimized] = skeleton
+    skeleton_bytes, skeleton_adopted = skeleton
+
+    # Each chunk starts from an unpickled copy of the skeleton; only the data
+    # rows and data-range merges remain to be filled in. Note the style_cache
+    # must NOT be cleared between chunks: its NamedStyles are registered in the
+    # skeleton and stay valid in every copy of it.
+    wb_chunk = pickle.loads(skeleton_bytes)
+    ws_chunk = wb_chunk.active
+
+    global _styles_adopted
+    _styles_adopted = skeleton_adopted
+
+    current_target_row = heading_rows + 1 if heading_rows > 0 else 1
+
+    data_row_offset = source_data_start_row - current_target_row
+    copy_cell = _copy_cell_properties
+    target_cell_at = ws_chunk.cell
+    source_row_heights = state['row_heights']
+    # With adopted style registries a target cell is fully described by value,
+    # data_type and the source's StyleArray, so cells can be constructed
+    # directly into the target's sparse dict, skipping ws.cell() bookkeeping
+    # and Cell.__init__'s default-style setup.
+    direct_cells = ws_chunk._cells if (_styles_adopted and _DIRECT_CELLS_OK and hasattr(ws_chunk, '_cells')) else None
+    data_rows_iter = ws_source.iter_rows(min_row=source_data_start_row, max_row=source_data_end_row, max_col=max_col)
+    for target_r_idx, source_row in enumerate(data_rows_iter, current_target_row):
+        if (cancel_event is not None and target_r_idx % _CANCEL_CHECK_ROWS == 0
+                and cancel_event.is_set()):
+            raise _SplitCancelled()
+        for col_idx, source_cell in enumerate(source_row, 1):
+            # Skip cells with nothing to copy; sparse-but-wide sheets are
+            # common and every skipped cell is one less Cell allocated in the
+            # target's _cells dict (and one less entry in its styles table).
+            if (source_cell.value is None and not source_cell.has_style
+                    and source_cell.hyperlink is None and source_cell.comment is None):
+                continue
+            # MergedCell placeholders lack the _value/_hyperlink slots, so
+            # only true Cell objects take the direct-construction path.
+            if (direct_cells is not None and type(source_cell) is Cell
+                    and source_cell._hyperlink is None and source_cell._comment is None):
+                new_cell = Cell.__new__(Cell)
+                new_cell.parent = ws_chunk
+                new_cell.row = target_r_idx
+                new_cell.column = col_idx
+                new_cell._value = source_cell._value
+                new_cell.data_type = source_cell.data_type
+                new_cell._style = source_cell._style
+                new_cell._hyperlink = None
+                new_cell._comment = None
+                direct_cells[(target_r_idx, col_idx)] = new_cell
+            else:
+                copy_cell(source_cell, target_cell_at(row=target_r_idx, column=col_idx))
+        source_r_idx = target_r_idx + data_row_offset
+        height = source_row_heights.get(source_r_idx)
+        if height is not None:
+            # The unpickled holder loses its defaultdict factory (openpyxl's
+            # BoundDictionary __init__ doesn't match defaultdict.__reduce__),
+            # so build the dimension explicitly instead of relying on it.
+            ws_chunk.row_dimensions[target_r_idx] = RowDimension(
+                ws_chunk, index=target_r_idx, ht=height)
+    _copy_merged_cells(data_merges, data_merge_min_rows, ws_chunk, source_data_start_row, source_data_end_row, data_row_offset)
+
+    if saver is not None:
+        saver.submit(wb_chunk, output_path)
+    else:
+        wb_chunk.save(output_path)
+
 # --- Main Application Class ---
 class App:
     """The main application class that orchestrates the GUI and the worker thread."""
@@ -212,6 +1114,19 @@ class App:
         self.output_directory = filedialog.askdirectory(title="Select Output Directory", initialdir=os.path.dirname(self.input_file))
         if not self.output_directory: return False
 
+        self.preserve_formatting = messagebox.askyesno(
+            title="Preserve Formatting?",
+            message="Do you want to preserve cell formatting (fonts, fills, borders, merges)?\n\n"
+                    "• 'Yes' keeps full fidelity, but is slower and uses more memory.\n"
+                    "• 'No' streams values only, which is much faster on large files."
+        )
+
+        global _copy_cell_properties
+        if not self.preserve_formatting:
+            _copy_cell_properties = _copy_cell_properties_v2
+            print("Using fast streaming mode (values only, no formatting).")
+            return self._get_row_settings()
+
         use_version2 = messagebox.askyesno(
             title="Select Cell Copying Method",
             message="Please choose the method for copying cell styles.\n\n"
@@ -219,16 +1134,17 @@ class App:
                     "• Standard: Slower, direct-copy method for baseline compatibility.\n\n"
                     "Do you want to use the Optimized method?"
         )
-        global _copy_cell_properties, _copy_row_formatting
         if use_version2:
             _copy_cell_properties = _copy_cell_properties_v2
-            _copy_row_formatting = _copy_row_formatting_v2
             print("Using optimized copy functions (Style Caching).")
         else:
             _copy_cell_properties = _copy_cell_properties_v1
-            _copy_row_formatting = _copy_row_formatting_v1
             print("Using standard copy functions.")
 
+        return self._get_row_settings()
+
+    def _get_row_settings(self):
+        """Collects the chunk size, header-row count and formula handling from the user."""
         try:
             self.chunk_size = simpledialog.askinteger("Data Rows Per File", "Enter data rows per file (excluding headers):", initialvalue=50000, minvalue=1)
             if self.chunk_size is None: return False
@@ -252,45 +1168,48 @@ class App:
         print(f"  Chunk size: {self.chunk_size}")
         print(f"  Header rows: {self.heading_rows}")
         print(f"  Preserve Formulas: {'Yes' if self.preserve_formulas else 'No'}")
+        print(f"  Preserve Formatting: {'Yes' if self.preserve_formatting else 'No'}")
         print("------------------\n")
 
-        try:
-            wb_check = openpyxl.load_workbook(self.input_file, read_only=True)
-            total_rows_check = wb_check.active.max_row
-            wb_check.close()
-            data_rows_check = total_rows_check - self.heading_rows
-            num_chunks_check = (data_rows_check + self.chunk_size - 1) // self.chunk_size if data_rows_check > 0 else 0
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not read input file to determine size: {e}")
-            return
-
-        if num_chunks_check <= 0:
-            messagebox.showinfo("Information", "No data rows to process based on the settings provided.")
-            return
-
+        # The worker sizes the source itself and reports the chunk count via
+        # an init message; a pre-scan here would parse the sheet XML on the
+        # Tk thread and freeze the window for seconds on big files.
         self.progress_queue = queue.Queue()
         self.cancel_event = threading.Event()
-        self.progress_manager = ProgressManager(self.root, "Splitting File...", num_chunks_check, self.cancel_event)
-        
+        self.progress_manager = ProgressManager(self.root, "Splitting File...", self.cancel_event)
+
         self.worker_thread = threading.Thread(
             target=split_excel_file_with_formatting,
-            args=(self.input_file, self.output_directory, self.chunk_size, self.heading_rows, self.preserve_formulas, self.progress_queue, self.cancel_event)
+            args=(self.input_file, self.output_directory, self.chunk_size, self.heading_rows, self.preserve_formulas, self.preserve_formatting, self.progress_queue, self.cancel_event)
         )
         self.worker_thread.start()
         self.root.after(100, self.check_queue)
 
     def check_queue(self):
-        """Periodically checks the queue for messages from the worker thread."""
+        """Periodically checks the queue for messages from the worker thread.
+
+        Progress messages are coalesced: the queue is drained and only the
+        latest one is painted, so a burst of fast chunks costs one Tcl
+        round-trip instead of one per chunk.
+        """
+        pending_progress = None
         try:
             while True:
                 message = self.progress_queue.get(block=False)
                 if message['type'] == 'progress':
-                    self.progress_manager.update(message['step'], message['status'])
+                    pending_progress = message
+                elif message['type'] == 'init':
+                    self.progress_manager.set_total(message['num_chunks'])
+                elif message['type'] == 'warn':
+                    print(f"\nWarning: {message['message']}")
+                    messagebox.showwarning("Warning", message['message'])
                 elif message['type'] == 'result':
                     self.on_task_finished(message['data'])
                     return
         except queue.Empty:
             pass
+        if pending_progress is not None:
+            self.progress_manager.update(pending_progress['step'], pending_progress['status'])
 
         if self.worker_thread.is_alive():
             self.root.after(100, self.check_queue)
@@ -328,7 +1247,86 @@ class App:
             print("\nOperation cancelled during setup. Exiting...")
             self.root.destroy()
 
+def _parse_cli_args():
+    """Parses command-line options; --input selects headless mode.
+
+    The other options only configure a headless run, so supplying any of
+    them without --input is reported as an error instead of being silently
+    ignored by the GUI flow.
+    """
+    parser = argparse.ArgumentParser(
+        description="Split a large .xlsx file into smaller ones. "
+                    "Run without arguments for the interactive GUI.")
+    parser.add_argument('--input', help="input .xlsx file (enables headless mode)")
+    parser.add_argument('--output-dir', help="output directory (default: the input file's directory)")
+    parser.add_argument('--chunk-size', type=int, default=50000, help="data rows per output file (default: 50000)")
+    parser.add_argument('--header-rows', type=int, default=1, help="header rows repeated in each file (default: 1)")
+    parser.add_argument('--preserve-formulas', action='store_true', help="keep formulas instead of cached values")
+    parser.add_argument('--preserve-formatting', action='store_true', help="preserve cell formatting (slower)")
+    parser.add_argument('--standard-copy', action='store_true', help="use the standard (uncached) cell copier")
+    args = parser.parse_args()
+    if not args.input and (args.output_dir or args.preserve_formulas or args.preserve_formatting
+                           or args.standard_copy or args.chunk_size != 50000 or args.header_rows != 1):
+        parser.error("--input is required when other options are given")
+    return args
+
+def run_headless(args):
+    """Runs a split without any GUI, driven entirely by command-line arguments.
+
+    Skips Tk and the dialog flow so batch/cron jobs work on headless machines;
+    Ctrl+C requests the same graceful cancellation as the GUI's Cancel button.
+    """
+    global _copy_cell_properties
+    _copy_cell_properties = _copy_cell_properties_v1 if args.standard_copy else _copy_cell_properties_v2
+    output_directory = args.output_dir or os.path.dirname(os.path.abspath(args.input))
+
+    print("SplitXL (headless)")
+    print("=" * 40)
+    progress_queue = queue.Queue()
+    cancel_event = threading.Event()
+    worker = threading.Thread(
+        target=split_excel_file_with_formatting,
+        args=(args.input, output_directory, args.chunk_size, args.header_rows,
+              args.preserve_formulas, args.preserve_formatting, progress_queue, cancel_event),
+        daemon=True,
+    )
+    worker.start()
+
+    progress = CliProgress()
+    result = None
+    while result is None:
+        try:
+            try:
+                message = progress_queue.get(timeout=0.1)
+            except queue.Empty:
+                if not worker.is_alive():
+                    result = {'status': 'error', 'message': 'The worker thread terminated unexpectedly.', 'files_created': 'Unknown'}
+                continue
+        except KeyboardInterrupt:
+            print("\nCancellation requested...")
+            cancel_event.set()
+            continue
+        if message['type'] == 'progress':
+            progress.update(message['step'], message['status'])
+        elif message['type'] == 'init':
+            progress.set_total(message['num_chunks'])
+        elif message['type'] == 'warn':
+            print(f"\nWarning: {message['message']}")
+        elif message['type'] == 'result':
+            result = message['data']
+    progress.close()
+
+    print("\n--- Operation Summary ---")
+    print(f"Status: {result.get('status', 'Unknown').title()}")
+    print(f"Message: {result.get('message', 'No message.')}")
+    print(f"Total Files Created: {result.get('files_created', 'N/A')}")
+    print("-------------------------\n")
+    return 0 if result.get('status') == 'success' else 1
+
 if __name__ == "__main__":
+    cli_args = _parse_cli_args()
+    if cli_args.input:
+        sys.exit(run_headless(cli_args))
     try:
         root = tk.Tk()
         root.attributes('-alpha', 0.0)